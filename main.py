@@ -17,24 +17,85 @@ Notes:
 - If you delete movie_booking.db, it will be recreated and reseeded on next run.
 """
 from __future__ import annotations
+import errno
 import sqlite3
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime
-from typing import List, Tuple
+from typing import Iterator, List, NamedTuple, Tuple
 import os
 import sys
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 DB_FILE = "movie_booking.db"
+# Set MOVIE_BOOKING_DEBUG=1 to print query plans for the seat lookups at startup
+DEBUG = bool(os.environ.get("MOVIE_BOOKING_DEBUG"))
 
 # ----------------------------- DB SETUP ------------------------------------ #
 
 def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_FILE)
+    # Autocommit mode: write paths open their own BEGIN IMMEDIATE transactions
+    conn = sqlite3.connect(DB_FILE, isolation_level=None, cached_statements=256)
     conn.row_factory = sqlite3.Row
     # Enforce foreign keys
     conn.execute("PRAGMA foreign_keys = ON;")
+    # WAL lets readers and a writer work concurrently; NORMAL sync is safe under WAL
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute("PRAGMA busy_timeout = 5000;")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA cache_size = -20000;")  # ~20 MB
+    return conn
+
+
+def get_ro_conn() -> sqlite3.Connection:
+    """Open a read-only connection for listing queries; it never takes the write lock."""
+    conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True, isolation_level=None, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    # journal_mode/synchronous are the writer's business; a read-only handle can't change them
+    conn.execute("PRAGMA busy_timeout = 5000;")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA cache_size = -20000;")  # ~20 MB
     return conn
 
+
+@contextmanager
+def writer_lock() -> Iterator[None]:
+    """Serialize writers across CLI processes with a lock on a sidecar file.
+
+    Readers stay unlocked; WAL already gives them a consistent snapshot.
+    """
+    with open(DB_FILE + ".wlock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            # LK_LOCK gives up with OSError after ~10 one-second retries; keep queuing
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError as e:
+                    if e.errno != errno.EDEADLOCK:
+                        raise
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Bump when SCHEMA_SQL changes so existing databases re-run it on next start
+SCHEMA_VERSION = 1
+
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -58,15 +119,6 @@ CREATE TABLE IF NOT EXISTS shows (
     FOREIGN KEY(movie_id) REFERENCES movies(id) ON DELETE CASCADE
 );
 
-CREATE TABLE IF NOT EXISTS seats (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    show_id INTEGER NOT NULL,
-    seat_label TEXT NOT NULL,
-    is_booked INTEGER NOT NULL DEFAULT 0,
-    UNIQUE(show_id, seat_label),
-    FOREIGN KEY(show_id) REFERENCES shows(id) ON DELETE CASCADE
-);
-
 CREATE TABLE IF NOT EXISTS bookings (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
@@ -77,10 +129,20 @@ CREATE TABLE IF NOT EXISTS bookings (
     FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY(show_id) REFERENCES shows(id) ON DELETE CASCADE
 );
+
+-- A seat is booked iff a bookings row exists for it; the unique index is what
+-- prevents double booking. Older databases get it here and lose the seats table.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_show_seat ON bookings(show_id, seat_label);
+CREATE INDEX IF NOT EXISTS idx_bookings_user ON bookings(user_id);
+DROP INDEX IF EXISTS idx_bookings_show;
+DROP TABLE IF EXISTS seats;
 """
 
 SEAT_ROWS = ["A", "B"]
 SEATS_PER_ROW = 10  # A1-A10, B1-B10
+# Every show has the same layout, so the labels are built once at import
+ALL_SEAT_LABELS: Tuple[str, ...] = tuple(f"{r}{n}" for r in SEAT_ROWS for n in range(1, SEATS_PER_ROW + 1))
+_SEAT_LABEL_SET = frozenset(ALL_SEAT_LABELS)
 
 SEED_MOVIES = [
     ("Starlight Odyssey", "U/A", 128),
@@ -97,44 +159,53 @@ SEED_SHOWS = [
 ]
 
 
-def init_db() -> None:
-    with get_conn() as conn:
-        conn.executescript(SCHEMA_SQL)
-        # seed if empty
-        cur = conn.execute("SELECT COUNT(*) AS c FROM movies;")
-        if cur.fetchone()["c"] == 0:
-            for title, rating, dur in SEED_MOVIES:
-                conn.execute(
+def init_db(conn: sqlite3.Connection) -> None:
+    # Schema and seed only need to run once per database file; user_version records that
+    ver = conn.execute("PRAGMA user_version;").fetchone()[0]
+    if ver < SCHEMA_VERSION:
+        # executescript() would commit a transaction opened beforehand, so BEGIN goes
+        # inside the script: DDL, seed and version bump then commit or roll back together.
+        # IMMEDIATE: a deferred read-then-seed would hit "database is locked" if
+        # another CLI seeds a fresh database between our COUNT and INSERT
+        conn.executescript("BEGIN IMMEDIATE;\n" + SCHEMA_SQL)
+        try:
+            # seed if empty (databases from before user_version may already have data)
+            cur = conn.execute("SELECT COUNT(*) AS c FROM movies;")
+            if cur.fetchone()["c"] == 0:
+                conn.executemany(
                     "INSERT INTO movies(title, rating, duration_mins) VALUES (?, ?, ?);",
-                    (title, rating, dur),
+                    SEED_MOVIES,
                 )
-            conn.commit()
 
-            # Insert shows
-            for idx, show_time, screen, price in SEED_SHOWS:
-                # movies are 1-indexed by AUTOINCREMENT
-                movie_id = idx + 1
-                conn.execute(
+                # Insert shows (movies are 1-indexed by AUTOINCREMENT)
+                conn.executemany(
                     "INSERT INTO shows(movie_id, show_time, screen, price) VALUES (?, ?, ?, ?);",
-                    (movie_id, show_time, screen, price),
+                    [(idx + 1, show_time, screen, price) for idx, show_time, screen, price in SEED_SHOWS],
                 )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
             conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
-            # Insert seats for each show
-            cur = conn.execute("SELECT id FROM shows;")
-            for row in cur.fetchall():
-                show_id = row["id"]
-                for r in SEAT_ROWS:
-                    for n in range(1, SEATS_PER_ROW + 1):
-                        label = f"{r}{n}"
-                        conn.execute(
-                            "INSERT INTO seats(show_id, seat_label, is_booked) VALUES (?, ?, 0);",
-                            (show_id, label),
-                        )
-            conn.commit()
+    if DEBUG:
+        for sql in (
+            "SELECT seat_label FROM bookings WHERE show_id = ? AND seat_label IN (?, ?);",
+            "SELECT seat_label FROM bookings WHERE show_id = ?;",
+        ):
+            for row in conn.execute("EXPLAIN QUERY PLAN " + sql, (1, "A1", "A2")[: sql.count("?")]):
+                print(f"[plan] {row['detail']}")
 
 # ---------------------------- DATA ACCESS ---------------------------------- #
 
+# Hot-path SQL kept as fixed strings so sqlite3's statement cache reuses them.
+# "{}" is filled with one "?" per seat; each group size gets its own cache entry.
+_SQL_SHOW_PRICE = "SELECT price FROM shows WHERE id = ?;"
+_SQL_BOOKED_SEATS = "SELECT seat_label FROM bookings WHERE show_id = ? AND seat_label IN ({});"
+_SQL_INSERT_BOOKING = "INSERT INTO bookings(user_id, show_id, seat_label, booked_at, amount_paid) VALUES (?, ?, ?, ?, ?);"
+_SQL_BOOKING_RECEIPT = "SELECT id, seat_label, amount_paid FROM bookings WHERE show_id = ? AND seat_label IN ({}) ORDER BY id;"
+_SQL_DELETE_BOOKING = "DELETE FROM bookings WHERE id = ?;"
+
 def get_movies(conn: sqlite3.Connection) -> List[sqlite3.Row]:
     return list(conn.execute("SELECT id, title, rating, duration_mins FROM movies ORDER BY title;"))
 
@@ -161,12 +232,31 @@ def get_show(conn: sqlite3.Connection, show_id: int) -> sqlite3.Row | None:
     return cur.fetchone()
 
 
-def seat_map(conn: sqlite3.Connection, show_id: int) -> List[Tuple[str, bool]]:
+def get_show_with_seats(conn: sqlite3.Connection, show_id: int) -> Tuple[dict | None, List[str], List[bool]]:
+    """Return show details plus seat labels and booked flags from a single query.
+
+    The show details are None when the show does not exist.
+    """
     cur = conn.execute(
-        "SELECT seat_label, is_booked FROM seats WHERE show_id = ? ORDER BY seat_label;",
+        """
+        SELECT m.title, s.show_time, s.screen, b.seat_label
+        FROM shows s
+        JOIN movies m ON m.id = s.movie_id
+        LEFT JOIN bookings b ON b.show_id = s.id
+        WHERE s.id = ?
+        """,
         (show_id,),
     )
-    return [(r["seat_label"], bool(r["is_booked"])) for r in cur.fetchall()]
+    cur.row_factory = None
+    rows = cur.fetchall()
+    if not rows:
+        return None, [], []
+    title, show_time, screen, _ = rows[0]
+    meta = {"title": title, "show_time": show_time, "screen": screen}
+    taken = {r[3] for r in rows}
+    labels = list(ALL_SEAT_LABELS)
+    booked = [label in taken for label in ALL_SEAT_LABELS]
+    return meta, labels, booked
 
 
 def ensure_user(conn: sqlite3.Connection, name: str, phone: str) -> int:
@@ -183,92 +273,104 @@ def ensure_user(conn: sqlite3.Connection, name: str, phone: str) -> int:
         return row["id"]
 
 
-def book_seats(conn: sqlite3.Connection, user_id: int, show_id: int, seat_labels: List[str]) -> List[int]:
-    # Normalize labels
-    seat_labels = [s.strip().upper() for s in seat_labels if s.strip()]
+class BookingResult(NamedTuple):
+    ids: List[int]
+    total: int
+    seats: List[str]
+
+
+def book_seats(conn: sqlite3.Connection, user_id: int, show_id: int, seat_labels: List[str]) -> BookingResult:
+    # Normalize labels and drop duplicates in one pass, keeping the order the user typed
+    seat_labels = list(dict.fromkeys(label for s in seat_labels if (label := s.strip().upper())))
     if not seat_labels:
         raise ValueError("No seat labels provided")
 
-    # Transaction
-    try:
-        cur = conn.execute("SELECT price FROM shows WHERE id = ?;", (show_id,))
-        show_row = cur.fetchone()
-        if not show_row:
-            raise ValueError("Show not found")
-        price = int(show_row["price"])
-
-        booking_ids: List[int] = []
-        now = datetime.now().isoformat(timespec="seconds")
-
-        for label in seat_labels:
-            # Check availability
-            cur = conn.execute(
-                "SELECT id, is_booked FROM seats WHERE show_id = ? AND seat_label = ?;",
-                (show_id, label),
-            )
-            seat_row = cur.fetchone()
-            if not seat_row:
-                raise ValueError(f"Seat {label} does not exist for this show")
-            if seat_row["is_booked"]:
-                raise ValueError(f"Seat {label} is already booked")
-
-            # Mark as booked
-            conn.execute(
-                "UPDATE seats SET is_booked = 1 WHERE id = ?;",
-                (seat_row["id"],),
-            )
+    missing = [label for label in seat_labels if label not in _SEAT_LABEL_SET]
+    if missing:
+        raise ValueError(f"Seat {', '.join(missing)} does not exist for this show")
 
-            # Create booking
-            cur = conn.execute(
-                "INSERT INTO bookings(user_id, show_id, seat_label, booked_at, amount_paid) VALUES (?, ?, ?, ?, ?);",
-                (user_id, show_id, label, now, price),
+    placeholders = ",".join("?" * len(seat_labels))
+
+    with writer_lock():
+        # Take the write lock up-front so the transaction never has to upgrade
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            # Hot path reads use plain tuple rows instead of sqlite3.Row
+            cur = conn.execute(_SQL_SHOW_PRICE, (show_id,))
+            cur.row_factory = None
+            show_row = cur.fetchone()
+            if not show_row:
+                raise ValueError("Show not found")
+            price = int(show_row[0])
+
+            now = time.strftime("%Y-%m-%dT%H:%M:%S")  # same ISO text as before, no datetime object
+
+            # The unique (show_id, seat_label) index rejects any seat that is already taken
+            try:
+                conn.executemany(
+                    _SQL_INSERT_BOOKING,
+                    [(user_id, show_id, label, now, price) for label in seat_labels],
+                )
+            except sqlite3.IntegrityError:
+                # Undo the partial insert so the follow-up read sees the real seat state
+                conn.rollback()
+                cur = conn.execute(_SQL_BOOKED_SEATS.format(placeholders), (show_id, *seat_labels))
+                cur.row_factory = None
+                taken = {r[0] for r in cur.fetchall()}
+                if not taken:
+                    raise
+                raise ValueError(f"Seat {', '.join(l for l in seat_labels if l in taken)} is already booked")
+
+            # Each seat has at most one live booking, so these are exactly the new rows;
+            # one read returns them in insert order to build the receipt
+            cur = conn.execute(_SQL_BOOKING_RECEIPT.format(placeholders), (show_id, *seat_labels))
+            cur.row_factory = None
+            rows = cur.fetchall()
+            result = BookingResult(
+                ids=[r[0] for r in rows],
+                total=sum(r[2] for r in rows),
+                seats=[r[1] for r in rows],
             )
-            booking_ids.append(cur.lastrowid)
 
-        conn.commit()
-        return booking_ids
-    except Exception:
-        conn.rollback()
-        raise
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
 
 
-def get_bookings_by_phone(conn: sqlite3.Connection, phone: str) -> List[sqlite3.Row]:
-    return list(
-        conn.execute(
-            """
-            SELECT b.id, m.title, s.show_time, s.screen, b.seat_label, b.amount_paid, b.booked_at
-            FROM bookings b
-            JOIN shows s ON s.id = b.show_id
-            JOIN movies m ON m.id = s.movie_id
-            JOIN users u ON u.id = b.user_id
-            WHERE u.phone = ?
-            ORDER BY b.booked_at DESC
-            """,
-            (phone.strip(),),
-        )
+def get_bookings_by_phone(conn: sqlite3.Connection, phone: str) -> Iterator[sqlite3.Row]:
+    # Stream rows straight off the cursor rather than materializing them all
+    cur = conn.execute(
+        """
+        SELECT b.id, m.title, s.show_time, s.screen, b.seat_label, b.amount_paid, b.booked_at
+        FROM bookings b
+        JOIN shows s ON s.id = b.show_id
+        JOIN movies m ON m.id = s.movie_id
+        JOIN users u ON u.id = b.user_id
+        WHERE u.phone = ?
+        ORDER BY b.booked_at DESC
+        """,
+        (phone.strip(),),
     )
+    yield from cur
 
 
 def cancel_booking(conn: sqlite3.Connection, booking_id: int) -> bool:
-    # Find booking
-    cur = conn.execute("SELECT id, show_id, seat_label FROM bookings WHERE id = ?;", (booking_id,))
-    row = cur.fetchone()
-    if not row:
-        return False
-    show_id = row["show_id"]
-    seat_label = row["seat_label"]
+    with writer_lock():
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            # Deleting the booking is all it takes to free the seat
+            cur = conn.execute(_SQL_DELETE_BOOKING, (booking_id,))
+            if cur.rowcount == 0:
+                conn.rollback()
+                return False
+            conn.commit()
+            return True
+        except Exception:
+            conn.rollback()
+            raise
 
-    try:
-        conn.execute("DELETE FROM bookings WHERE id = ?;", (booking_id,))
-        conn.execute(
-            "UPDATE seats SET is_booked = 0 WHERE show_id = ? AND seat_label = ?;",
-            (show_id, seat_label),
-        )
-        conn.commit()
-        return True
-    except Exception:
-        conn.rollback()
-        raise
 
 # ------------------------------ UI HELPERS --------------------------------- #
 
@@ -314,27 +416,15 @@ def show_seat_map(conn: sqlite3.Connection) -> None:
     except ValueError:
         print("Invalid number.")
         return
-    sh = get_show(conn, show_id)
+    sh, labels, booked = get_show_with_seats(conn, show_id)
     if not sh:
         print("Show not found.")
         return
     print_heading(f"Seat Map — {sh['title']} @ {sh['show_time']} • {sh['screen']}")
-    seats = seat_map(conn, show_id)
-    # Pretty print 10 per row
-    current_row = None
-    line = []
-    for label, booked in seats:
-        row_letter = label[0]
-        if current_row is None:
-            current_row = row_letter
-        if row_letter != current_row:
-            print(" ".join(line))
-            line = []
-            current_row = row_letter
-        cell = f"{label}{'(X)' if booked else '( )'}"
-        line.append(cell)
-    if line:
-        print(" ".join(line))
+    cells = [f"{label}(X)" if b else f"{label}( )" for label, b in zip(labels, booked)]
+    # Pretty print SEATS_PER_ROW per row
+    for i in range(0, len(cells), SEATS_PER_ROW):
+        print(" ".join(cells[i : i + SEATS_PER_ROW]))
 
 
 def make_booking(conn: sqlite3.Connection) -> None:
@@ -357,19 +447,18 @@ def make_booking(conn: sqlite3.Connection) -> None:
         if seat_input.lower() == "map":
             show_seat_map(conn)
             continue
-        seat_labels = [s.strip().upper() for s in seat_input.split(",") if s.strip()]
-        if not seat_labels:
+        if not seat_input:
             print("Please enter at least one seat.")
             continue
         try:
-            ids = book_seats(conn, user_id, show_id, seat_labels)
-            total = len(ids) * int(sh["price"])
+            # book_seats normalizes and de-duplicates the labels itself
+            result = book_seats(conn, user_id, show_id, seat_input.split(","))
             print("\nBooking confirmed! 🎟️")
             print(f"Movie: {sh['title']}")
             print(f"Show:  {sh['show_time']} • {sh['screen']}")
-            print(f"Seats: {', '.join(seat_labels)}")
-            print(f"Amount: ₹{total}")
-            print(f"Booking IDs: {', '.join(map(str, ids))}")
+            print(f"Seats: {', '.join(result.seats)}")
+            print(f"Amount: ₹{result.total}")
+            print(f"Booking IDs: {', '.join(map(str, result.ids))}")
             break
         except Exception as e:
             print(f"Error: {e}")
@@ -378,15 +467,15 @@ def make_booking(conn: sqlite3.Connection) -> None:
 
 def view_my_bookings(conn: sqlite3.Connection) -> None:
     phone = input("Enter your phone: ").strip()
-    rows = get_bookings_by_phone(conn, phone)
     print_heading("Your Bookings")
-    if not rows:
-        print("No bookings found.")
-        return
-    for r in rows:
+    found = False
+    for r in get_bookings_by_phone(conn, phone):
+        found = True
         print(
             f"[#{r['id']}] {r['title']} • {r['show_time']} • {r['screen']} • Seat {r['seat_label']} • ₹{r['amount_paid']} • at {r['booked_at']}"
         )
+    if not found:
+        print("No bookings found.")
 
 
 def cancel_my_booking(conn: sqlite3.Connection) -> None:
@@ -416,43 +505,47 @@ Choose: """
 
 
 def main() -> None:
-    init_db()
-    while True:
-        try:
-            choice = input(MENU).strip()
-        except (EOFError, KeyboardInterrupt):
-            print("\nGoodbye!")
-            break
-        if choice == "1":
-            with get_conn() as conn:
-                show_movies(conn)
+    # Long-lived connections keep sqlite3's statement cache warm across actions:
+    # conn for writes (options 4, 6), ro_conn for pure reads (options 1, 2, 3, 5)
+    conn = get_conn()
+    ro_conn = None
+    try:
+        init_db(conn)
+        # Opened after init_db so the database file is guaranteed to exist
+        ro_conn = get_ro_conn()
+        while True:
+            try:
+                choice = input(MENU).strip()
+            except (EOFError, KeyboardInterrupt):
+                print("\nGoodbye!")
+                break
+            if choice == "1":
+                show_movies(ro_conn)
                 pause()
-        elif choice == "2":
-            with get_conn() as conn:
-                show_shows_for_movie(conn)
+            elif choice == "2":
+                show_shows_for_movie(ro_conn)
                 pause()
-        elif choice == "3":
-            with get_conn() as conn:
-                show_seat_map(conn)
+            elif choice == "3":
+                show_seat_map(ro_conn)
                 pause()
-        elif choice == "4":
-            with get_conn() as conn:
+            elif choice == "4":
                 make_booking(conn)
                 pause()
-        elif choice == "5":
-            with get_conn() as conn:
-                view_my_bookings(conn)
+            elif choice == "5":
+                view_my_bookings(ro_conn)
                 pause()
-        elif choice == "6":
-            with get_conn() as conn:
+            elif choice == "6":
                 cancel_my_booking(conn)
                 pause()
-        elif choice == "0":
-            print("Bye! 👋, WELCOME AGAIN!!")
-            break
-        else:
-            print("Invalid option. Try again.\n")
-
+            elif choice == "0":
+                print("Bye! 👋, WELCOME AGAIN!!")
+                break
+            else:
+                print("Invalid option. Try again.\n")
+    finally:
+        if ro_conn is not None:
+            ro_conn.close()
+        conn.close()
 
 if __name__ == "__main__":
     main()